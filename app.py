@@ -1,23 +1,158 @@
 import gradio as gr
+import asyncio
 import qrcode
-from qrcode.image.styledpil import StyledPilImage
-from qrcode.image.styles.moduledrawers import (
-    RoundedModuleDrawer,
-    CircleModuleDrawer,
-    GappedSquareModuleDrawer,
-    SquareModuleDrawer
-)
 from qrcode.image.styles.colormasks import SolidFillColorMask, SquareGradiantColorMask
 from PIL import Image, ImageOps, ImageDraw, ImageFont
+import numpy as np
+import pandas as pd
 import io
 import base64
+import bisect
 import json
 import csv
 import os
+import mmap
+import atexit
+import threading
+import queue
+import time
+import shutil
+import tempfile
+from collections import Counter, deque
+from functools import lru_cache
+from concurrent.futures import (
+    ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
 from datetime import datetime
+from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
-import re
+
+try:
+    import segno
+except ImportError:
+    segno = None  # fall back to the pure-Python qrcode encoder
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None  # keep qrcode's pure-Python mask scoring
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # UI URL checks run the blocking validator in a thread
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None  # decode with pyzbar only
+
+try:
+    from pyzbar.pyzbar import decode as _zbar_decode
+except ImportError:
+    _zbar_decode = None  # QR decoding disabled
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Output locations
+OUTPUT_DIR = Path("/mnt/user-data/outputs")
+HISTORY_FILE = OUTPUT_DIR / "qr_history.jsonl"
+LEGACY_HISTORY_FILE = OUTPUT_DIR / "qr_history.json"  # imported once, then removed
+
+# Error correction mapping
+ERROR_MAP = {
+    "L (7%)": "l",
+    "M (15%)": "m",
+    "Q (25%)": "q",
+    "H (30%)": "h"
+}
+
+# Output size mapping
+SIZE_MAP = {
+    "Small (300x300)": 300,
+    "Medium (600x600)": 600,
+    "Large (1200x1200)": 1200,
+    "Print (2400x2400)": 2400
+}
+
+# Longest image edge handed to the QR detector; larger uploads are downscaled
+DECODE_MAX_EDGE = 1024
+
+# QR types, in the same order as their input groups in the UI
+QR_MODES = (
+    "Link/URL",
+    "Wi-Fi",
+    "vCard (Contact)",
+    "Email",
+    "SMS/Text",
+    "Phone Call",
+    "Cryptocurrency",
+    "Social Media",
+    "Calendar Event",
+    "App Store"
+)
+
+# Input group visibility per QR type, built once from shared updates
+_SHOW = gr.update(visible=True)
+_HIDE = gr.update(visible=False)
+MODE_VISIBILITY = {
+    mode: tuple(_SHOW if mode == other else _HIDE for other in QR_MODES)
+    for mode in QR_MODES
+}
+
+# Required CSV columns per batch mode
+BATCH_COLUMNS = {
+    "URLs": ["url"],
+    "Wi-Fi": ["ssid", "password", "security"],
+    "vCards": ["name", "phone", "email", "org"],
+    "Custom": ["data"]
+}
+
+# Rows parsed per pandas chunk in batch mode
+CSV_CHUNK_ROWS = 1024
+
+# Batch gallery refreshes after this many newly rendered codes
+BATCH_PROGRESS_EVERY = 8
+
+# Batch PNGs live under one app-owned directory; batches untouched for
+# longer than BATCH_MAX_AGE are pruned (Gradio has cached them by then)
+BATCH_ROOT = Path(tempfile.gettempdir()) / "qrgen_batches"
+BATCH_MAX_AGE = 3600  # seconds
+
+# vCard payload shared by single and batch generation
+_VCARD_TMPL = "BEGIN:VCARD\nVERSION:3.0\nFN:{}\nTEL:{}\nEMAIL:{}\nORG:{}\nEND:VCARD"
+
+# Characters that must be backslash-escaped inside Wi-Fi QR fields
+_WIFI_SPECIAL = ('\\', ';', ',', '"', ':')
+_WIFI_ESCAPE = str.maketrans({ch: '\\' + ch for ch in _WIFI_SPECIAL})
+
+# Translation table that strips date/time separators for iCal timestamps
+_CAL_STRIP = str.maketrans('', '', '-:')
+
+# Shared HTTP session so URL checks reuse pooled keep-alive connections
+_HTTP = requests.Session()
+_HTTP.headers['User-Agent'] = 'qrgen/1.0'
+_HTTP.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_HTTP.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# Async URL checks from the UI: bounded concurrency, short timeout
+URL_CHECK_TIMEOUT = 2  # seconds
+_URL_CHECK_SEM = asyncio.Semaphore(5)
+
+# In-memory generation history; a background thread appends it to disk
+HISTORY_FLUSH_INTERVAL = 0.5  # seconds
+HISTORY_FLUSH_BATCH = 32  # entries
+HISTORY_COMPACT_BYTES = 64 * 1024  # compact the append-only file above this at startup
+_history = deque(maxlen=50)
+_history_lock = threading.Lock()
+_history_queue = queue.Queue()
+_history_stop = threading.Event()
+_history_writer = None
 
 
 # =============================================================================
@@ -27,18 +162,43 @@ import re
 def initialize_app():
     """Initialize application and create necessary files"""
     # Create output directory if it doesn't exist
-    output_dir = "/mnt/user-data/outputs"
-    os.makedirs(output_dir, exist_ok=True)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Create history file if it doesn't exist
-    history_file = os.path.join(output_dir, 'qr_history.json')
+    # Load the most recent entries once; afterwards history is served from memory
+    entries = []
+    rewrite = False
+    if HISTORY_FILE.exists():
+        try:
+            entries, rewrite = _read_history_tail(_history.maxlen)
+        except Exception:
+            rewrite = True  # Unreadable; replace it with what can be recovered
     
-    if not os.path.exists(history_file):
+    if LEGACY_HISTORY_FILE.exists():
+        # One-time import of the old single-document history file; a corrupt
+        # one is dropped too, rather than failing again on every start
         try:
-            with open(history_file, 'w') as f:
-                json.dump([], f)
+            with open(LEGACY_HISTORY_FILE, 'r') as f:
+                legacy = [entry for entry in json.load(f) if isinstance(entry, dict)]
+            entries = (legacy + entries)[-_history.maxlen:]
         except Exception:
-            pass  # Fail silently
+            pass  # Nothing usable to import
+        rewrite = True
+    
+    try:
+        if rewrite or (
+            HISTORY_FILE.exists() and HISTORY_FILE.stat().st_size > HISTORY_COMPACT_BYTES
+        ):
+            # Heals damage and compacts: appends only ever grow the file
+            _rewrite_history(entries)
+        elif not HISTORY_FILE.exists():
+            HISTORY_FILE.touch()
+        LEGACY_HISTORY_FILE.unlink(missing_ok=True)
+    except Exception:
+        pass  # Fail silently
+    
+    _history.extend(entries)
+    
+    start_history_writer()
 
 
 # =============================================================================
@@ -47,8 +207,6 @@ def initialize_app():
 
 def generate_csv_template(batch_mode):
     """Generate CSV template based on batch mode"""
-    output_dir = "/mnt/user-data/outputs"
-    
     templates = {
         "URLs": {
             "filename": "url_template.csv",
@@ -92,10 +250,10 @@ def generate_csv_template(batch_mode):
         return None, "Invalid batch mode selected"
     
     template = templates[batch_mode]
-    filepath = os.path.join(output_dir, template["filename"])
+    filepath = str(OUTPUT_DIR / template["filename"])
     
     try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+        with open(filepath, 'w', newline='', encoding='utf-8', buffering=65536) as f:
             writer = csv.writer(f)
             writer.writerow(template["headers"])
             writer.writerows(template["sample_data"])
@@ -107,13 +265,7 @@ def generate_csv_template(batch_mode):
 
 def validate_csv_structure(csv_file, expected_mode):
     """Validate CSV structure matches expected batch mode"""
-    
-    expected_columns = {
-        "URLs": ["url"],
-        "Wi-Fi": ["ssid", "password", "security"],
-        "vCards": ["name", "phone", "email", "org"],
-        "Custom": ["data"]
-    }
+    expected_columns = BATCH_COLUMNS
     
     if expected_mode not in expected_columns:
         return False, "Invalid batch mode"
@@ -151,6 +303,29 @@ def validate_csv_structure(csv_file, expected_mode):
         return False, f"❌ Error reading CSV: {str(e)}"
 
 
+def count_csv_rows(path):
+    """Estimate data rows by scanning raw bytes for line breaks (header excluded)
+    
+    Blank lines and quoted multi-line fields are counted too, so this is an
+    upper bound meant for display only.
+    """
+    newlines = returns = 0
+    last = b"\n"
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            newlines += block.count(b"\n")
+            returns += block.count(b"\r")
+            last = block[-1:]
+    
+    # Old Mac-style files break lines with a bare CR
+    lines = newlines or returns
+    
+    # A final line without a trailing line break still counts
+    if last not in (b"\n", b"\r"):
+        lines += 1
+    return max(0, lines - 1)
+
+
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
@@ -164,7 +339,7 @@ def validate_url(url):
         
         # Try to reach the URL (with timeout)
         try:
-            response = requests.head(url, timeout=5, allow_redirects=True)
+            response = _HTTP.head(url, timeout=5, allow_redirects=True)
             if response.status_code < 400:
                 return True, "URL is reachable"
             else:
@@ -175,22 +350,58 @@ def validate_url(url):
         return False, "Invalid URL"
 
 
+async def validate_url_async(url):
+    """Validate a URL without blocking the event loop (at most 5 checks at once)"""
+    try:
+        result = urlparse(url)
+        if not all([result.scheme, result.netloc]):
+            return False, "Invalid URL format"
+    except Exception:
+        return False, "Invalid URL"
+    
+    if aiohttp is None:
+        return await asyncio.to_thread(validate_url, url)
+    
+    try:
+        async with _URL_CHECK_SEM:
+            timeout = aiohttp.ClientTimeout(total=URL_CHECK_TIMEOUT)
+            async with aiohttp.ClientSession(timeout=timeout, headers=_HTTP.headers) as session:
+                async with session.head(url, allow_redirects=True) as response:
+                    status = response.status
+    except Exception:
+        return True, "URL format valid (connectivity check failed)"
+    
+    if status < 400:
+        return True, "URL is reachable"
+    return True, f"URL returned status {status}"
+
+
+def validate_urls(urls):
+    """Validate many URLs concurrently, returning results in input order"""
+    # Checks are network-bound, so threads overlap the waits; the 5s
+    # per-request timeout bounds the slowest thread, not the whole batch
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        return list(executor.map(validate_url, urls))
+
+
 def check_password_strength(password):
     """Check Wi-Fi password strength"""
     if len(password) < 8:
         return "Weak - Too short (min 8 characters)", "🔴"
     
-    score = 0
-    if len(password) >= 12:
-        score += 1
-    if re.search(r'[A-Z]', password):
-        score += 1
-    if re.search(r'[a-z]', password):
-        score += 1
-    if re.search(r'[0-9]', password):
-        score += 1
-    if re.search(r'[^A-Za-z0-9]', password):
-        score += 1
+    # Classify every character in a single pass
+    has_upper = has_lower = has_digit = has_special = False
+    for ch in password:
+        if 'A' <= ch <= 'Z':
+            has_upper = True
+        elif 'a' <= ch <= 'z':
+            has_lower = True
+        elif '0' <= ch <= '9':
+            has_digit = True
+        else:
+            has_special = True
+    
+    score = (len(password) >= 12) + has_upper + has_lower + has_digit + has_special
     
     if score >= 4:
         return "Strong", "🟢"
@@ -200,52 +411,153 @@ def check_password_strength(password):
         return "Weak", "🔴"
 
 
-def save_to_history(qr_type, data_preview):
-    """Save QR generation to history"""
-    output_dir = "/mnt/user-data/outputs"
-    history_file = os.path.join(output_dir, 'qr_history.json')
+def _read_history_tail(limit):
+    """Parse only the last `limit` lines of the JSONL history file
     
-    try:
-        if os.path.exists(history_file):
-            with open(history_file, 'r') as f:
-                history = json.load(f)
+    Returns (entries, damaged). Lines that fail to parse (e.g. an append cut
+    short by a crash) are skipped and reported as damage, so the caller can
+    rewrite the file before new entries get glued onto a partial line.
+    """
+    with open(HISTORY_FILE, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], False
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Walk back from EOF over `limit` newlines
+            end = len(mm)
+            damaged = mm[end - 1] != ord("\n")
+            if not damaged:
+                end -= 1
+            start = end
+            for _ in range(limit):
+                start = mm.rfind(b"\n", 0, start)
+                if start < 0:
+                    break
+            tail = mm[start + 1:end]
+    
+    entries = []
+    for line in tail.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        if isinstance(entry, dict):
+            entries.append(entry)
         else:
-            history = []
-    except Exception:
-        history = []
+            damaged = True
+    return entries, damaged
+
+
+def _rewrite_history(entries):
+    """Atomically replace the history file with the given entries"""
+    tmp_file = HISTORY_FILE.with_name(HISTORY_FILE.name + ".tmp")
+    with open(tmp_file, 'w', buffering=8192) as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    os.replace(tmp_file, HISTORY_FILE)
+
+
+def write_history(items):
+    """Append queued history entries to disk; a None item means clear"""
+    mode = 'a'
+    if None in items:
+        # Truncate, keeping only entries queued after the last clear
+        mode = 'w'
+        items = items[len(items) - items[::-1].index(None):]
     
-    history.append({
+    try:
+        with open(HISTORY_FILE, mode, buffering=8192) as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in items)
+    except Exception:
+        pass  # Fail silently if can't write
+
+
+def _drain_history_queue(items):
+    """Move everything currently queued into items"""
+    while True:
+        try:
+            items.append(_history_queue.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def _history_writer_loop():
+    """Append queued history entries every ~500 ms or every 32 entries"""
+    while not _history_stop.is_set():
+        try:
+            items = [_history_queue.get(timeout=HISTORY_FLUSH_INTERVAL)]
+        except queue.Empty:
+            continue
+        
+        # Gather whatever else arrives shortly after, then write once
+        deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL
+        while len(items) < HISTORY_FLUSH_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_history_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        write_history(items)
+
+
+def start_history_writer():
+    """Start the background history writer thread"""
+    global _history_writer
+    if _history_writer is None:
+        _history_writer = threading.Thread(
+            target=_history_writer_loop, name="history-writer", daemon=True
+        )
+        _history_writer.start()
+
+
+def stop_history_writer():
+    """Stop the history writer and write any pending entries"""
+    _history_stop.set()
+    if _history_writer is not None:
+        _history_writer.join()
+    write_history(_drain_history_queue([]))
+
+
+atexit.register(stop_history_writer)
+
+
+def save_to_history(qr_type, data_preview):
+    """Save QR generation to history"""
+    entry = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'type': qr_type,
         'preview': data_preview[:50]
-    })
+    }
     
-    # Keep only last 50 entries
-    history = history[-50:]
+    # The deque keeps only the last 50 entries
+    with _history_lock:
+        _history.append(entry)
+        history = list(_history)
     
-    try:
-        with open(history_file, 'w') as f:
-            json.dump(history, f)
-    except Exception:
-        pass  # Fail silently if can't write
+    # Disk write happens on the writer thread
+    _history_queue.put_nowait(entry)
     
     return history
 
 
 def load_history():
     """Load QR generation history"""
-    output_dir = "/mnt/user-data/outputs"
-    history_file = os.path.join(output_dir, 'qr_history.json')
+    with _history_lock:
+        return list(_history)
+
+
+def reset_history():
+    """Clear QR generation history"""
+    with _history_lock:
+        _history.clear()
     
-    try:
-        if os.path.exists(history_file):
-            with open(history_file, 'r') as f:
-                history = json.load(f)
-            return history
-        else:
-            return []
-    except Exception:
-        return []
+    # Queued behind any pending entries, so the writer truncates in order
+    _history_queue.put_nowait(None)
+    return []
 
 
 def get_analytics():
@@ -254,17 +566,14 @@ def get_analytics():
     if not history:
         return "No data yet"
     
-    type_counts = {}
-    for entry in history:
-        qr_type = entry['type']
-        type_counts[qr_type] = type_counts.get(qr_type, 0) + 1
+    type_counts = Counter(entry['type'] for entry in history)
     
     total = len(history)
     analytics_text = f"### 📊 QR Generation Analytics\n\n"
     analytics_text += f"**Total Generated:** {total}\n\n"
     analytics_text += "**By Type:**\n"
     
-    for qr_type, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
+    for qr_type, count in type_counts.most_common():
         percentage = (count / total) * 100
         analytics_text += f"- {qr_type}: {count} ({percentage:.1f}%)\n"
     
@@ -275,83 +584,323 @@ def get_analytics():
 # DATA FORMATTING FUNCTIONS
 # =============================================================================
 
+def _format_wifi(args):
+    ssid, password, security = args[1], args[2], args[3]
+    ssid, password = ssid.translate(_WIFI_ESCAPE), password.translate(_WIFI_ESCAPE)
+    return f"WIFI:S:{ssid};T:{security};P:{password};;"
+
+
+def _format_vcard(args):
+    name, phone, email, org = args[4], args[5], args[6], args[7]
+    return _VCARD_TMPL.format(name, phone, email, org)
+
+
+def _format_email(args):
+    dest, sub, body = args[8], args[9], args[10]
+    return f"MAILTO:{dest}?subject={sub}&body={body}"
+
+
+def _format_sms(args):
+    phone, message = args[11], args[12]
+    return f"SMSTO:{phone}:{message}"
+
+
+def _format_crypto(args):
+    crypto_type, address, amount = args[14], args[15], args[16]
+    if crypto_type == "Bitcoin":
+        return f"bitcoin:{address}?amount={amount}" if amount else f"bitcoin:{address}"
+    elif crypto_type == "Ethereum":
+        return f"ethereum:{address}?value={amount}" if amount else f"ethereum:{address}"
+
+
+# Profile URL templates per social platform
+_SOCIAL_FMT = {
+    "Instagram": "https://instagram.com/{}",
+    "Twitter/X": "https://twitter.com/{}",
+    "LinkedIn": "https://linkedin.com/in/{}",
+    "Facebook": "https://facebook.com/{}",
+    "TikTok": "https://tiktok.com/@{}",
+    "YouTube": "https://youtube.com/@{}"
+}
+
+
+def _format_social(args):
+    platform, username = args[17], args[18]
+    template = _SOCIAL_FMT.get(platform)
+    return template.format(username) if template else f"https://{username}"
+
+
+def _format_calendar(args):
+    title, location, start, end, desc = args[19], args[20], args[21], args[22], args[23]
+    return (
+        "BEGIN:VEVENT\n"
+        f"SUMMARY:{title}\n"
+        f"LOCATION:{location}\n"
+        f"DTSTART:{start.translate(_CAL_STRIP)}00\n"
+        f"DTEND:{end.translate(_CAL_STRIP)}00\n"
+        f"DESCRIPTION:{desc}\n"
+        "END:VEVENT"
+    )
+
+
+def _format_app_store(args):
+    app_platform, app_id = args[24], args[25]
+    if app_platform == "iOS":
+        return f"https://apps.apple.com/app/id{app_id}"
+    else:
+        return f"https://play.google.com/store/apps/details?id={app_id}"
+
+
+# QR type -> formatter taking the positional form inputs
+_FORMATTERS = {
+    "Link/URL": lambda args: args[0],
+    "Wi-Fi": _format_wifi,
+    "vCard (Contact)": _format_vcard,
+    "Email": _format_email,
+    "SMS/Text": _format_sms,
+    "Phone Call": lambda args: f"TEL:{args[13]}",
+    "Cryptocurrency": _format_crypto,
+    "Social Media": _format_social,
+    "Calendar Event": _format_calendar,
+    "App Store": _format_app_store
+}
+
+
 def format_data(mode, *args):
     """Format data based on QR type"""
-    if mode == "Link/URL":
+    formatter = _FORMATTERS.get(mode)
+    if formatter is None:
         return args[0]
+    return formatter(args)
+
+
+# =============================================================================
+# QR GENERATION FUNCTION
+# =============================================================================
+
+@lru_cache(maxsize=4096)
+def _encode_packed(data, error_level):
+    """Encode data into its QR module grid, packed 8 modules per byte (cached)
     
-    elif mode == "Wi-Fi":
-        ssid, password, security = args[1], args[2], args[3]
-        return f"WIFI:S:{ssid};T:{security};P:{password};;"
-    
-    elif mode == "vCard (Contact)":
-        name, phone, email, org = args[4], args[5], args[6], args[7]
-        return (
-            "BEGIN:VCARD\n"
-            "VERSION:3.0\n"
-            f"FN:{name}\n"
-            f"TEL:{phone}\n"
-            f"EMAIL:{email}\n"
-            f"ORG:{org}\n"
-            "END:VCARD"
-        )
+    Returns (side, bytes); even a version 40 code takes under 4 KB.
+    """
+    error = ERROR_MAP[error_level]
+    if segno is not None:
+        # Keep the requested level and UTF-8 bytes, matching the qrcode output
+        qr = segno.make_qr(data, error=error, boost_error=False, encoding='utf-8')
+        modules = np.array(list(qr.matrix_iter(scale=1, border=4)), dtype=bool)
+    else:
+        error_correction = getattr(qrcode.constants, f"ERROR_CORRECT_{error.upper()}")
+        qr = qrcode.QRCode(error_correction=error_correction, border=4)
+        qr.add_data(data)
+        qr.make(fit=True)
+        modules = np.array(qr.get_matrix(), dtype=bool)
     
-    elif mode == "Email":
-        dest, sub, body = args[8], args[9], args[10]
-        return f"MAILTO:{dest}?subject={sub}&body={body}"
-    
-    elif mode == "SMS/Text":
-        phone, message = args[11], args[12]
-        return f"SMSTO:{phone}:{message}"
-    
-    elif mode == "Phone Call":
-        phone = args[13]
-        return f"TEL:{phone}"
-    
-    elif mode == "Cryptocurrency":
-        crypto_type, address, amount = args[14], args[15], args[16]
-        if crypto_type == "Bitcoin":
-            return f"bitcoin:{address}?amount={amount}" if amount else f"bitcoin:{address}"
-        elif crypto_type == "Ethereum":
-            return f"ethereum:{address}?value={amount}" if amount else f"ethereum:{address}"
-    
-    elif mode == "Social Media":
-        platform, username = args[17], args[18]
-        platforms = {
-            "Instagram": f"https://instagram.com/{username}",
-            "Twitter/X": f"https://twitter.com/{username}",
-            "LinkedIn": f"https://linkedin.com/in/{username}",
-            "Facebook": f"https://facebook.com/{username}",
-            "TikTok": f"https://tiktok.com/@{username}",
-            "YouTube": f"https://youtube.com/@{username}"
-        }
-        return platforms.get(platform, f"https://{username}")
-    
-    elif mode == "Calendar Event":
-        title, location, start, end, desc = args[19], args[20], args[21], args[22], args[23]
-        return (
-            "BEGIN:VEVENT\n"
-            f"SUMMARY:{title}\n"
-            f"LOCATION:{location}\n"
-            f"DTSTART:{start.replace('-', '').replace(':', '')}00\n"
-            f"DTEND:{end.replace('-', '').replace(':', '')}00\n"
-            f"DESCRIPTION:{desc}\n"
-            "END:VEVENT"
-        )
+    return modules.shape[0], np.packbits(modules).tobytes()
+
+
+def _encode_matrix(data, error_level):
+    """Encode data into its QR module grid as a bool array, border included"""
+    side, packed = _encode_packed(data, error_level)
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=side * side)
+    return bits.reshape(side, side).view(bool)
+
+
+if segno is None and njit is not None:
+    @njit(cache=True)
+    def _lost_point_jit(modules):
+        """Compiled port of qrcode.util.lost_point (same rules, same shortcuts)"""
+        n = modules.shape[0]
+        
+        # Rule 1: runs of five or more same-colored modules
+        lost_point = 0
+        for i in range(n):
+            row_color = modules[i, 0]
+            col_color = modules[0, i]
+            row_length = 0
+            col_length = 0
+            for j in range(n):
+                if modules[i, j] == row_color:
+                    row_length += 1
+                else:
+                    if row_length >= 5:
+                        lost_point += row_length - 2
+                    row_length = 1
+                    row_color = modules[i, j]
+                if modules[j, i] == col_color:
+                    col_length += 1
+                else:
+                    if col_length >= 5:
+                        lost_point += col_length - 2
+                    col_length = 1
+                    col_color = modules[j, i]
+            if row_length >= 5:
+                lost_point += row_length - 2
+            if col_length >= 5:
+                lost_point += col_length - 2
+        
+        # Rule 2: 2x2 blocks of one color
+        for row in range(n - 1):
+            col = 0
+            while col < n - 1:
+                top_right = modules[row, col + 1]
+                if top_right != modules[row + 1, col + 1]:
+                    col += 1
+                elif top_right == modules[row, col] and top_right == modules[row + 1, col]:
+                    lost_point += 3
+                col += 1
+        
+        # Rule 3: finder-like 1:1:3:1:1 patterns in rows and columns
+        for line in range(n):
+            for axis in range(2):
+                k = 0
+                while k < n - 10:
+                    if axis == 0:
+                        p = modules[line, k:k + 11]
+                    else:
+                        p = modules[k:k + 11, line]
+                    if (
+                        not p[1] and p[4] and not p[5] and p[6] and not p[9]
+                        and (
+                            p[0] and p[2] and p[3] and not p[7] and not p[8] and not p[10]
+                            or not p[0] and not p[2] and not p[3] and p[7] and p[8] and p[10]
+                        )
+                    ):
+                        lost_point += 40
+                    if p[10]:
+                        k += 1
+                    k += 1
+        
+        # Rule 4: overall dark/light balance
+        percent = float(modules.sum()) / (n * n)
+        rating = int(abs(percent * 100 - 50) / 5)
+        return lost_point + rating * 10
     
-    elif mode == "App Store":
-        app_platform, app_id = args[24], args[25]
-        if app_platform == "iOS":
-            return f"https://apps.apple.com/app/id{app_id}"
-        else:
-            return f"https://play.google.com/store/apps/details?id={app_id}"
+    def _lost_point(modules):
+        """Score a mask candidate with the compiled penalty rules"""
+        return _lost_point_jit(np.asarray(modules, dtype=np.uint8))
     
-    return args[0]
+    # qrcode evaluates all eight masks through util.lost_point
+    qrcode.util.lost_point = _lost_point
 
 
-# =============================================================================
-# QR GENERATION FUNCTION
-# =============================================================================
+def _paint_square(draw, box, corners):
+    draw.rectangle(box, fill=255)
+
+
+def _paint_rounded(draw, box, corners):
+    # A circle, with the square quadrant filled back in for every corner
+    # that touches a dark neighbour
+    x0, y0, x1, y1 = box
+    mx, my = (x0 + x1) // 2, (y0 + y1) // 2
+    draw.ellipse(box, fill=255)
+    quadrants = ((x0, y0, mx, my), (mx, y0, x1, my), (mx, my, x1, y1), (x0, my, mx, y1))
+    for rounded, quadrant in zip(corners, quadrants):
+        if not rounded:
+            draw.rectangle(quadrant, fill=255)
+
+
+def _paint_circle(draw, box, corners):
+    draw.ellipse(box, fill=255)
+
+
+def _paint_gapped_square(draw, box, corners):
+    delta = round((box[2] - box[0] + 1) * 0.1)
+    draw.rectangle((box[0] + delta, box[1] + delta, box[2] - delta, box[3] - delta), fill=255)
+
+
+# Module style -> tile painter
+MODULE_PAINTERS = {
+    "Rounded": _paint_rounded,
+    "Circles": _paint_circle,
+    "Squares": _paint_square,
+    "Gapped Squares": _paint_gapped_square
+}
+
+
+@lru_cache(maxsize=64)
+def _style_tiles(module_style, scale):
+    """Pre-render the module tiles for a style at scale x scale pixels
+    
+    Returns a uint8 array of darkness values (255 = black) indexed by tile
+    id: 0 is an empty module, 1 a plain square (used for the finder eyes),
+    and 2 + mask a styled module whose set mask bits (NW, NE, SE, SW) mark
+    corners with no adjacent dark neighbours.
+    """
+    painter = MODULE_PAINTERS[module_style]
+    
+    # Draw 4x larger and downsample for anti-aliased edges
+    big = scale * 4
+    tiles = np.zeros((18, scale, scale), dtype=np.uint8)
+    tiles[1] = 255
+    for mask in range(16):
+        tile = Image.new('L', (big, big), 0)
+        corners = tuple(bool(mask & bit) for bit in (1, 2, 4, 8))
+        painter(ImageDraw.Draw(tile), (0, 0, big - 1, big - 1), corners)
+        tiles[2 + mask] = np.asarray(tile.resize((scale, scale), Image.Resampling.LANCZOS))
+    return tiles
+
+
+@lru_cache(maxsize=32)
+def _load_logo(path, logo_size):
+    """Open and fit a logo onto its white pad once per path and size (cached)"""
+    logo_img = ImageOps.fit(Image.open(path), (logo_size, logo_size))
+    
+    # Create white background for logo
+    logo_bg = Image.new('RGB', (logo_size + 20, logo_size + 20), 'white')
+    logo_bg.paste(logo_img, (10, 10))
+    return logo_bg
+
+
+def _draw_styled(matrix, module_style, size, logo=None):
+    """Draw a module grid as a size x size styled image (grayscale unless a logo is added)"""
+    modules = np.asarray(matrix, dtype=bool)
+    count = modules.shape[0]
+    border = 4
+    
+    # Pick a tile id per module; corner masks come from the four neighbours
+    padded = np.pad(modules, 1)
+    north, south = ~padded[:-2, 1:-1], ~padded[2:, 1:-1]
+    west, east = ~padded[1:-1, :-2], ~padded[1:-1, 2:]
+    masks = (
+        (north & west) * 1 | (north & east) * 2
+        | (south & east) * 4 | (south & west) * 8
+    )
+    tile_ids = np.where(modules, 2 + masks, 0).astype(np.uint8)
+    
+    # Finder eyes stay plain squares so the code remains easy to scan
+    eye = np.zeros_like(modules)
+    for row, col in ((border, border), (border, count - border - 7), (count - border - 7, border)):
+        eye[row:row + 7, col:col + 7] = True
+    tile_ids[eye & modules] = 1
+    
+    # Render at a whole number of pixels per module, then centre it on a
+    # white canvas of the exact size: the leftover pixels only widen the
+    # quiet zone, so no resampling pass is needed and every module stays sharp
+    scale = max(1, size // count)
+    side = count * scale
+    offset = (size - side) // 2
+    tiles = _style_tiles(module_style, scale)[tile_ids]
+    
+    # Gather tiles into one contiguous array; always black on white
+    pixels = np.full((size, size), 255, dtype=np.uint8)
+    pixels[offset:offset + side, offset:offset + side] = (
+        255 - tiles.transpose(0, 2, 1, 3).reshape(side, side)
+    )
+    img = Image.fromarray(pixels, mode='L')
+    
+    # Add logo if provided (a file path, or an image from _load_logo)
+    if logo is not None:
+        img_w, img_h = img.size
+        if not isinstance(logo, Image.Image):
+            logo = _load_logo(logo, int(img_w * 0.18))
+        
+        img = img.convert('RGB')
+        logo_w, logo_h = logo.size
+        img.paste(logo, ((img_w - logo_w) // 2, (img_h - logo_h) // 2))
+    
+    return img
+
 
 def generate_advanced_qr(
     mode,
@@ -393,64 +942,9 @@ def generate_advanced_qr(
         except Exception:
             pass  # Continue even if history save fails
         
-        # Error correction mapping
-        error_map = {
-            "L (7%)": qrcode.constants.ERROR_CORRECT_L,
-            "M (15%)": qrcode.constants.ERROR_CORRECT_M,
-            "Q (25%)": qrcode.constants.ERROR_CORRECT_Q,
-            "H (30%)": qrcode.constants.ERROR_CORRECT_H
-        }
-        
-        # Module drawer mapping
-        drawer_map = {
-            "Rounded": RoundedModuleDrawer(),
-            "Circles": CircleModuleDrawer(),
-            "Squares": SquareModuleDrawer(),
-            "Gapped Squares": GappedSquareModuleDrawer()
-        }
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            error_correction=error_map[error_level],
-            box_size=10,
-            border=4
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Generate with style - always black on white
-        img = qr.make_image(
-            image_factory=StyledPilImage,
-            module_drawer=drawer_map[module_style],
-            fill_color="#000000",
-            back_color="#ffffff"
-        ).convert("RGB")
-        
-        # Resize to specified size
-        size_map = {
-            "Small (300x300)": 300,
-            "Medium (600x600)": 600,
-            "Large (1200x1200)": 1200,
-            "Print (2400x2400)": 2400
-        }
-        target_size = size_map[qr_size]
-        img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-        
-        # Add logo if provided
-        if logo is not None:
-            logo_img = Image.open(logo)
-            img_w, img_h = img.size
-            logo_size = int(img_w * 0.18)
-            logo_img = ImageOps.fit(logo_img, (logo_size, logo_size))
-            
-            # Create white background for logo
-            logo_bg = Image.new('RGB', (logo_size + 20, logo_size + 20), 'white')
-            logo_bg.paste(logo_img, (10, 10))
-            
-            img.paste(
-                logo_bg,
-                ((img_w - logo_size - 20) // 2, (img_h - logo_size - 20) // 2)
-            )
+        # Encode (cached) then draw with the requested style
+        matrix = _encode_matrix(data, error_level)
+        img = _draw_styled(matrix, module_style, SIZE_MAP[qr_size], logo)
         
         # Return just the image
         return img
@@ -464,141 +958,321 @@ def generate_advanced_qr(
 # BATCH GENERATION FUNCTION
 # =============================================================================
 
+def _encode_qr_png(data, error_level, module_style, size):
+    """Encode data as a styled QR code and return PNG bytes"""
+    img = _draw_styled(_encode_matrix(data, error_level), module_style, size)
+    
+    # Hard-edged styles are pure black and white; store those as 1-bit
+    if img.getcolors(2) is not None:
+        img = img.convert('1')
+    
+    # Low zlib effort: saving dominated batch time at the default level
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=False, compress_level=1)
+    return buffer.getvalue()
+
+
+def _read_csv_chunks(path, batch_mode):
+    """Yield chunks of the batch CSV holding only the required columns as strings"""
+    required = BATCH_COLUMNS[batch_mode]
+    chunks = pd.read_csv(
+        path,
+        dtype=str,
+        encoding='utf-8',
+        keep_default_na=False,
+        # Rows wider than the header must not turn column 0 into the index
+        index_col=False,
+        usecols=lambda col: col.lower().strip() in required,
+        chunksize=CSV_CHUNK_ROWS
+    )
+    for chunk in chunks:
+        # Normalize headers the same way validation does; headers that only
+        # differ in case or spacing collapse to one, so keep the first
+        chunk.columns = [col.lower().strip() for col in chunk.columns]
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        yield chunk.fillna("")
+
+
+def _wifi_escape(series):
+    """Backslash-escape Wi-Fi special characters across a whole Series"""
+    # Backslash goes first so the escapes added below are not doubled
+    for ch in _WIFI_SPECIAL:
+        series = series.str.replace(ch, '\\' + ch, regex=False)
+    return series
+
+
+def _build_payloads(chunk, batch_mode):
+    """Build QR payloads for a chunk of rows with vectorized string ops
+    
+    Returns two aligned Series: the payloads and an error message per row
+    ("" when the row is valid).
+    """
+    if batch_mode == "URLs":
+        payloads = chunk['url'].str.strip()
+        errors = payloads.eq("").map({True: "Empty URL", False: ""})
+    
+    elif batch_mode == "Wi-Fi":
+        ssid = chunk['ssid'].str.strip()
+        password = chunk['password'].str.strip()
+        security = chunk['security'].str.strip()
+        payloads = (
+            "WIFI:S:" + _wifi_escape(ssid) + ";T:" + security
+            + ";P:" + _wifi_escape(password) + ";;"
+        )
+        errors = ssid.eq("").map({True: "Missing SSID", False: ""})
+    
+    elif batch_mode == "vCards":
+        name = chunk['name'].str.strip()
+        parts = _VCARD_TMPL.split("{}")
+        payloads = (
+            parts[0] + name
+            + parts[1] + chunk['phone'].str.strip()
+            + parts[2] + chunk['email'].str.strip()
+            + parts[3] + chunk['org'].str.strip()
+            + parts[4]
+        )
+        errors = name.eq("").map({True: "Missing name", False: ""})
+    
+    else:  # Custom
+        payloads = chunk['data'].str.strip()
+        errors = payloads.eq("").map({True: "Empty data", False: ""})
+    
+    return payloads, errors
+
+
+def _new_batch_dir():
+    """Create a directory for one batch's PNGs, pruning stale batches first"""
+    BATCH_ROOT.mkdir(parents=True, exist_ok=True)
+    
+    # A directory's mtime moves whenever a PNG is added, so batches still
+    # being written are never considered stale
+    cutoff = time.time() - BATCH_MAX_AGE
+    for old in BATCH_ROOT.iterdir():
+        try:
+            if old.stat().st_mtime < cutoff:
+                shutil.rmtree(old, ignore_errors=True)
+        except OSError:
+            pass  # Already removed by a concurrent batch
+    
+    return tempfile.mkdtemp(prefix="batch_", dir=BATCH_ROOT)
+
+
+def _render_qr_worker(data, error_level, module_style, size):
+    """Render one payload to PNG bytes (runs in a worker process)
+    
+    Returns (png_bytes, None) on success or (None, error message).
+    """
+    try:
+        # PNG bytes are shipped back to the parent since pickling PIL
+        # images is costly
+        return _encode_qr_png(data, error_level, module_style, size), None
+    except Exception as e:
+        return None, str(e)
+
+
 def batch_generate_qr(csv_file, batch_mode, error_level, module_style):
-    """Generate multiple QR codes from CSV file"""
+    """Generate multiple QR codes from CSV file
+    
+    Yields (image paths in row order, log) every few rendered codes, so the
+    gallery fills in progressively while the rest are still being encoded.
+    """
     if csv_file is None:
-        return None, "❌ Please upload a CSV file"
+        yield None, "❌ Please upload a CSV file"
+        return
     
     # Validate CSV structure
     is_valid, validation_message = validate_csv_structure(csv_file, batch_mode)
     
     if not is_valid:
-        return None, validation_message
+        yield None, validation_message
+        return
     
     try:
-        # Read CSV
-        with open(csv_file.name, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+        # A line-break scan is enough for the progress header; the CSV is
+        # parsed only once, while generating
+        total_rows = count_csv_rows(csv_file.name)
         
-        if not rows:
-            return None, "❌ CSV file is empty (no data rows)"
+        # Each code is written to its own PNG as soon as it is rendered
+        batch_dir = _new_batch_dir()
         
-        images = []
-        status_messages = []
-        status_messages.append(f"✅ CSV validated successfully")
-        status_messages.append(f"📊 Processing {len(rows)} entries...\n")
+        header = [
+            f"✅ CSV validated successfully",
+            f"📊 Processing up to {total_rows} entries...\n"
+        ]
         
-        for idx, row in enumerate(rows):
-            try:
-                if batch_mode == "URLs":
-                    data = row.get('url', '').strip()
-                    if not data:
-                        raise ValueError("Empty URL")
-                    
-                elif batch_mode == "Wi-Fi":
-                    ssid = row.get('ssid', '').strip()
-                    password = row.get('password', '').strip()
-                    security = row.get('security', 'WPA').strip()
-                    
-                    if not ssid:
-                        raise ValueError("Missing SSID")
-                    
-                    data = f"WIFI:S:{ssid};T:{security};P:{password};;"
-                    
-                elif batch_mode == "vCards":
-                    name = row.get('name', '').strip()
-                    phone = row.get('phone', '').strip()
-                    email = row.get('email', '').strip()
-                    org = row.get('org', '').strip()
-                    
-                    if not name:
-                        raise ValueError("Missing name")
-                    
-                    data = f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL:{phone}\nEMAIL:{email}\nORG:{org}\nEND:VCARD"
-                    
-                else:  # Custom
-                    data = row.get('data', '').strip()
-                    if not data:
-                        raise ValueError("Empty data")
-                
-                # Generate QR
-                error_map = {
-                    "L (7%)": qrcode.constants.ERROR_CORRECT_L,
-                    "M (15%)": qrcode.constants.ERROR_CORRECT_M,
-                    "Q (25%)": qrcode.constants.ERROR_CORRECT_Q,
-                    "H (30%)": qrcode.constants.ERROR_CORRECT_H
-                }
-                
-                drawer_map = {
-                    "Rounded": RoundedModuleDrawer(),
-                    "Circles": CircleModuleDrawer(),
-                    "Squares": SquareModuleDrawer(),
-                    "Gapped Squares": GappedSquareModuleDrawer()
-                }
-                
-                qr = qrcode.QRCode(error_correction=error_map[error_level])
-                qr.add_data(data)
-                qr.make(fit=True)
-                
-                # Always black on white
-                img = qr.make_image(
-                    image_factory=StyledPilImage,
-                    module_drawer=drawer_map[module_style],
-                    fill_color="#000000",
-                    back_color="#ffffff"
-                ).convert("RGB")
-                
-                img = img.resize((600, 600), Image.Resampling.LANCZOS)
-                images.append(img)
-                
-                # Truncate preview for display
-                preview = data[:40] + "..." if len(data) > 40 else data
-                status_messages.append(f"✅ Row {idx+1}: {preview}")
-                
-            except Exception as e:
-                status_messages.append(f"❌ Row {idx+1}: Error - {str(e)}")
+        # Renders finish out of order, so log lines are keyed by
+        # (row, step) and kept sorted; a row's URL warning precedes its result
+        row_log = []
         
-        # Create gallery image
-        if images:
-            cols = min(3, len(images))
-            rows_count = (len(images) + cols - 1) // cols
-            
-            gallery_width = 600 * cols + 20 * (cols + 1)
-            gallery_height = 600 * rows_count + 20 * (rows_count + 1)
+        def status():
+            return "\n".join(header + [message for _, _, message in row_log])
+        
+        # Rows are independent, so encoding is spread across all CPU cores;
+        # only a few tasks per worker are in flight at once, so memory stays
+        # flat however long the CSV is
+        idx = 0
+        workers = os.cpu_count() or 1
+        max_pending = 4 * workers
+        pending = {}
+        rendered = []  # (row, path), kept in row order for the gallery
+        
+        # Each distinct payload is encoded once and repeat rows reuse it:
+        # payload -> pending future, then (path, error) once it has finished
+        outcomes = {}
+        url_checks = {}  # url -> (is_valid, message)
+        
+        def record(row, data, path, error):
+            """Log one row's result; returns True when a progress update is due"""
+            if error:
+                bisect.insort(row_log, (row, 1, f"❌ Row {row}: Error - {error}"))
+                return False
             
-            gallery = Image.new('RGB', (gallery_width, gallery_height), 'white')
+            bisect.insort(rendered, (row, path))
             
-            for idx, img in enumerate(images):
-                row = idx // cols
-                col = idx % cols
-                x = 20 + col * (600 + 20)
-                y = 20 + row * (600 + 20)
-                gallery.paste(img, (x, y))
+            # Truncate preview for display
+            preview = data[:40] + "..." if len(data) > 40 else data
+            bisect.insort(row_log, (row, 1, f"✅ Row {row}: {preview}"))
+            return len(rendered) % BATCH_PROGRESS_EVERY == 0
+        
+        def progress():
+            note = f"\n\n🔄 {len(rendered)} rendered (of up to {total_rows})"
+            return [path for _, path in rendered], status() + note
+        
+        def drain(return_when):
+            """Store finished renders, yielding progress every few images"""
+            finished, _ = wait(pending, return_when=return_when)
+            for future in finished:
+                data, rows = pending.pop(future)
+                png_bytes, error = future.result()
+                path = None
+                if not error:
+                    path = os.path.join(batch_dir, f"qr_{rows[0]:05d}.png")
+                    with open(path, 'wb') as f:
+                        f.write(png_bytes)
+                outcomes[data] = (path, error)
+                
+                for row in rows:
+                    if record(row, data, path, error):
+                        yield progress()
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in _read_csv_chunks(csv_file.name, batch_mode):
+                payloads, errors = _build_payloads(chunk, batch_mode)
+                payloads, errors = payloads.tolist(), errors.tolist()
+                
+                # Check the chunk's URLs together so unreachable ones surface quickly
+                if batch_mode == "URLs":
+                    rows = [
+                        row for row, error in enumerate(errors, idx + 1) if not error
+                    ]
+                    valid = [data for data, error in zip(payloads, errors) if not error]
+                    
+                    # Probe each distinct URL once per batch; repeats reuse it
+                    unchecked = list(dict.fromkeys(url for url in valid if url not in url_checks))
+                    url_checks.update(zip(unchecked, validate_urls(unchecked)))
+                    for row, url in zip(rows, valid):
+                        is_valid, message = url_checks[url]
+                        if not is_valid or message != "URL is reachable":
+                            bisect.insort(row_log, (row, 0, f"⚠️ Row {row}: {message}"))
+                
+                for data, error in zip(payloads, errors):
+                    idx += 1
+                    if error:
+                        bisect.insort(row_log, (idx, 1, f"❌ Row {idx}: Error - {error}"))
+                        continue
+                    
+                    outcome = outcomes.get(data)
+                    if outcome is None:
+                        future = executor.submit(
+                            _render_qr_worker, data, error_level, module_style, 600
+                        )
+                        outcomes[data] = future
+                        pending[future] = (data, [idx])
+                        if len(pending) >= max_pending:
+                            yield from drain(FIRST_COMPLETED)
+                    elif isinstance(outcome, tuple):
+                        if record(idx, data, *outcome):
+                            yield progress()
+                    else:
+                        # Same payload still rendering; share its result
+                        pending[outcome][1].append(idx)
             
-            status = "\n".join(status_messages)
-            summary = f"\n\n{'='*50}\n📊 Summary: {len(images)}/{len(rows)} QR codes generated successfully"
-            return gallery, status + summary
+            yield from drain(ALL_COMPLETED)
+        
+        paths = [path for _, path in rendered]
+        if not idx:
+            yield None, "❌ CSV file is empty (no data rows)"
+        elif paths:
+            summary = f"\n\n{'='*50}\n📊 Summary: {len(paths)}/{idx} QR codes generated successfully"
+            yield paths, status() + summary
         else:
-            return None, "❌ No QR codes were generated\n\n" + "\n".join(status_messages)
+            yield None, "❌ No QR codes were generated\n\n" + status()
     
     except Exception as e:
-        return None, f"❌ Error processing CSV: {str(e)}"
+        yield None, f"❌ Error processing CSV: {str(e)}"
 
 
 # =============================================================================
 # QR DECODER FUNCTION
 # =============================================================================
 
+_decoder_local = threading.local()
+
+
+def _qr_detector():
+    """Return this thread's cv2.QRCodeDetector, creating it on first use"""
+    detector = getattr(_decoder_local, 'detector', None)
+    if detector is None:
+        detector = _decoder_local.detector = cv2.QRCodeDetector()
+    return detector
+
+
+def _cv2_decode(image_file):
+    """Decode a QR code with OpenCV; returns an empty string if none is found"""
+    img = cv2.imread(image_file, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        img = np.asarray(Image.open(image_file).convert('L'))
+    
+    # Detection cost grows with pixel count; shrink large photos first
+    height, width = img.shape
+    scale = DECODE_MAX_EDGE / max(height, width)
+    if scale < 1:
+        small = cv2.resize(
+            img, (round(width * scale), round(height * scale)),
+            interpolation=cv2.INTER_AREA
+        )
+        data, _, _ = _qr_detector().detectAndDecode(small)
+        if data:
+            return data
+    
+    # Small images, or codes too fine to survive the downscale
+    data, _, _ = _qr_detector().detectAndDecode(img)
+    return data
+
+
 def decode_qr(image_file):
     """Decode QR code from image"""
     if image_file is None:
         return "Please upload a QR code image"
     
+    if cv2 is None and _zbar_decode is None:
+        return "⚠️ QR decoder requires 'opencv-python-headless' or 'pyzbar'. Install with: pip install opencv-python-headless"
+    
     try:
-        from pyzbar.pyzbar import decode
-        img = Image.open(image_file)
-        decoded_objects = decode(img)
+        if cv2 is not None:
+            data = _cv2_decode(image_file)
+            if data:
+                result = "### Decoded QR Code Data\n\n"
+                result += "**Type:** QRCODE\n\n"
+                result += f"**Data:**\n```\n{data}\n```\n\n"
+                return result
+            if _zbar_decode is None:
+                return "No QR code found in the image"
+        
+        # zbar only needs luminance, so hand it an 8-bit grayscale buffer
+        img = Image.open(image_file).convert('L')
+        width, height = img.size
+        decoded_objects = _zbar_decode((img.tobytes(), width, height))
         
         if decoded_objects:
             result = "### Decoded QR Code Data\n\n"
@@ -609,8 +1283,6 @@ def decode_qr(image_file):
             return result
         else:
             return "No QR code found in the image"
-    except ImportError:
-        return "⚠️ QR decoder requires 'pyzbar' library. Install with: pip install pyzbar"
     except Exception as e:
         return f"Error decoding QR code: {str(e)}"
 
@@ -666,18 +1338,7 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
             with gr.Row():
                 with gr.Column(scale=1, elem_classes="input-group"):
                     mode = gr.Dropdown(
-                        [
-                            "Link/URL",
-                            "Wi-Fi",
-                            "vCard (Contact)",
-                            "Email",
-                            "SMS/Text",
-                            "Phone Call",
-                            "Cryptocurrency",
-                            "Social Media",
-                            "Calendar Event",
-                            "App Store"
-                        ],
+                        list(QR_MODES),
                         label="📋 Select QR Type",
                         value="Link/URL"
                     )
@@ -900,7 +1561,7 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
                     batch_btn = gr.Button("🔄 Generate Batch QR Codes", variant="primary", size="lg")
                 
                 with gr.Column():
-                    batch_output = gr.Image(label="Generated QR Codes Gallery")
+                    batch_output = gr.Gallery(label="Generated QR Codes Gallery", columns=4, preview=True)
                     batch_status = gr.Textbox(label="Batch Generation Log", lines=15)
         
         # TAB 3: QR Decoder
@@ -933,18 +1594,7 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
     
     def toggle_inputs(choice):
         """Toggle input fields based on QR type selection"""
-        return [
-            gr.update(visible=(choice == "Link/URL")),
-            gr.update(visible=(choice == "Wi-Fi")),
-            gr.update(visible=(choice == "vCard (Contact)")),
-            gr.update(visible=(choice == "Email")),
-            gr.update(visible=(choice == "SMS/Text")),
-            gr.update(visible=(choice == "Phone Call")),
-            gr.update(visible=(choice == "Cryptocurrency")),
-            gr.update(visible=(choice == "Social Media")),
-            gr.update(visible=(choice == "Calendar Event")),
-            gr.update(visible=(choice == "App Store"))
-        ]
+        return list(MODE_VISIBILITY[choice])
     
     mode.change(
         toggle_inputs,
@@ -952,15 +1602,15 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
         [url_box, wifi_box, vcard_box, email_box, sms_box, call_box, crypto_box, social_box, cal_box, app_box]
     )
     
-    def validate_url_handler(url):
+    async def validate_url_handler(url):
         """Validate URL when button is clicked"""
         if not url:
             return gr.update(value="Please enter a URL", visible=True)
         
-        is_valid, message = validate_url(url)
+        is_valid, message = await validate_url_async(url)
         return gr.update(value=message, visible=True)
     
-    validate_btn.click(validate_url_handler, url_input, url_status)
+    validate_btn.click(validate_url_handler, url_input, url_status, queue=False)
     
     def check_password(password):
         """Check password strength"""
@@ -969,7 +1619,11 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
         strength, emoji = check_password_strength(password)
         return f"{emoji} {strength}"
     
-    pw.change(check_password, pw, pw_strength)
+    # Cheap and idempotent: skip the queue and only score the latest keystroke
+    pw.change(
+        check_password, pw, pw_strength,
+        show_progress="hidden", trigger_mode="always_last", queue=False
+    )
     
     # Single QR generation
     btn.click(
@@ -1022,7 +1676,8 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
         is_valid, message = validate_csv_structure(csv_file, mode)
         
         if is_valid:
-            return gr.update(value=f"✅ {message}", visible=True)
+            rows = count_csv_rows(csv_file.name)
+            return gr.update(value=f"{message} (up to {rows} rows)", visible=True)
         else:
             return gr.update(value=message, visible=True)
     
@@ -1048,14 +1703,7 @@ with gr.Blocks(css=css, theme=gr.themes.Soft()) as demo:
         return load_history()
     
     def clear_history_handler():
-        output_dir = "/mnt/user-data/outputs"
-        history_file = os.path.join(output_dir, 'qr_history.json')
-        try:
-            with open(history_file, 'w') as f:
-                json.dump([], f)
-            return []
-        except Exception:
-            return []
+        return reset_history()
     
     refresh_analytics.click(refresh_analytics_handler, outputs=analytics_output)
     refresh_history.click(refresh_history_handler, outputs=history_output)